@@ -1,24 +1,40 @@
 """SalesBanana Web UI — thin FastAPI wrapper around generate_diagram()."""
 
 import asyncio
-import json
 import logging
+from collections.abc import Callable
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+import anyio.to_thread
+import orjson
+from fastapi import BackgroundTasks, FastAPI, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import StreamingResponse
 
 from pathlib import Path
 
 from src.config import IMAGE_MODELS, settings
 from src.pipeline import generate_diagram, improve_diagram
+from src.utils.image_utils import optimize_png
 
 logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="SalesBanana")
+# Each pipeline run holds a worker thread for minutes; anyio's default is 40
+_THREAD_LIMIT = 100
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = _THREAD_LIMIT
+    yield
+
+
+app = FastAPI(title="SalesBanana", lifespan=lifespan)
 
 # Serve generated images from output directory
 settings.output_dir.mkdir(parents=True, exist_ok=True)
@@ -27,6 +43,125 @@ app.mount("/output", StaticFiles(directory=str(settings.output_dir)), name="outp
 templates = Jinja2Templates(directory="templates")
 
 
+def _stream_with_progress(
+    func: Callable,
+    *args,
+    result_to_dict: Callable[[object], dict],
+    failure_message: str,
+    stream_images: bool = False,
+    **kwargs,
+) -> StreamingResponse:
+    """
+    Run a blocking pipeline function in the threadpool and stream its progress as SSE.
+
+    `func` must accept a `progress_callback` keyword. Emits one `step` event per
+    callback, then a final `done` event (JSON from `result_to_dict`) or `error`.
+    With `stream_images`, `func` also gets an `image_callback` and each
+    intermediate image is sent as a `round` event ({"round", "image_url"}).
+    On success, the result image is optimised after the stream closes.
+    """
+    results: list = []
+
+    def optimize_result() -> None:
+        for result in results:
+            optimize_png(result.image_path)
+
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+    loop = asyncio.get_event_loop()
+
+    def emit(event: str, data: str) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, f"event: {event}\ndata: {data}\n\n")
+
+    def progress_callback(step: str) -> None:
+        emit("step", step)
+
+    def image_callback(round_num: int, image_path: Path) -> None:
+        image_rel = image_path.relative_to(settings.output_dir)
+        emit("round", orjson.dumps({"round": round_num, "image_url": f"/output/{image_rel}"}).decode())
+
+    if stream_images:
+        kwargs["image_callback"] = image_callback
+
+    async def event_generator():
+        task = asyncio.create_task(run_in_threadpool(
+            func, *args, progress_callback=progress_callback, **kwargs,
+        ))
+
+        while True:
+            # Wait for either a queue item or the task to finish
+            get_task = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait(
+                [get_task, task], return_when=asyncio.FIRST_COMPLETED,
+            )
+
+            if get_task in done:
+                msg = get_task.result()
+                if msg is not None:
+                    yield msg
+            else:
+                get_task.cancel()
+
+            if task in done:
+                # Drain remaining queue items
+                while not queue.empty():
+                    msg = queue.get_nowait()
+                    if msg is not None:
+                        yield msg
+                break
+
+        # Send final result or error
+        try:
+            result = task.result()
+            results.append(result)
+            data = orjson.dumps(result_to_dict(result)).decode()
+            yield f"event: done\ndata: {data}\n\n"
+        except FileNotFoundError as e:
+            yield f"event: error\ndata: {e}\n\n"
+        except ValueError as e:
+            yield f"event: error\ndata: {e}\n\n"
+        except Exception:
+            logger.exception(failure_message)
+            yield f"event: error\ndata: {failure_message} Check server logs.\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(optimize_result),
+    )
+
+
+def _generate_response(result) -> dict:
+    """JSON body for a completed generate_diagram() run."""
+    image_rel = result.image_path.relative_to(settings.output_dir)
+    return {
+        "image_url": f"/output/{image_rel}",
+        "rounds_taken": result.rounds_taken,
+        "approved": result.approved,
+        "run_dir": str(result.run_dir),
+    }
+
+
+def _improve_response(result) -> dict:
+    """JSON body for a completed improve_diagram() run."""
+    image_rel = result.image_path.relative_to(settings.output_dir)
+    return {
+        "image_url": f"/output/{image_rel}",
+        "round_number": result.round_number,
+        "summary": result.summary,
+        "approved": result.approved,
+        "history": [
+            {
+                "round_number": r.round_number,
+                "summary": r.summary,
+                "image_filename": r.image_filename,
+                "approved": r.approved,
+            }
+            for r in result.history
+        ],
+    }
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     return templates.TemplateResponse(request, "index.html")
@@ -39,7 +174,7 @@ async def api_image_models():
 
 
 @app.post("/api/generate")
-async def api_generate(request: Request):
+async def api_generate(request: Request, background_tasks: BackgroundTasks):
     body = await request.json()
     brief = body.get("brief", "").strip()
     image_model = body.get("image_model")
@@ -51,7 +186,7 @@ async def api_generate(request: Request):
         return JSONResponse({"error": f"Unknown image model: {image_model}"}, status_code=400)
 
     try:
-        result = await asyncio.to_thread(
+        result = await run_in_threadpool(
             generate_diagram, brief, image_model=image_model,
         )
     except ValueError as e:
@@ -60,20 +195,35 @@ async def api_generate(request: Request):
         logger.exception("Pipeline failed")
         return JSONResponse({"error": "Pipeline failed. Check server logs."}, status_code=500)
 
-    # Build a relative URL for the generated image
-    image_rel = result.image_path.relative_to(settings.output_dir)
-    image_url = f"/output/{image_rel}"
+    background_tasks.add_task(optimize_png, result.image_path)
+    return _generate_response(result)
 
-    return {
-        "image_url": image_url,
-        "rounds_taken": result.rounds_taken,
-        "approved": result.approved,
-        "run_dir": str(result.run_dir),
-    }
+
+@app.post("/api/generate-stream")
+async def api_generate_stream(request: Request):
+    """SSE endpoint that streams pipeline step progress during generation."""
+    body = await request.json()
+    brief = body.get("brief", "").strip()
+    image_model = body.get("image_model")
+
+    if not brief:
+        return JSONResponse({"error": "Brief is required."}, status_code=400)
+
+    if image_model and image_model not in IMAGE_MODELS:
+        return JSONResponse({"error": f"Unknown image model: {image_model}"}, status_code=400)
+
+    return _stream_with_progress(
+        generate_diagram,
+        brief,
+        image_model=image_model,
+        result_to_dict=_generate_response,
+        failure_message="Pipeline failed.",
+        stream_images=True,
+    )
 
 
 @app.post("/api/improve")
-async def api_improve(request: Request):
+async def api_improve(request: Request, background_tasks: BackgroundTasks):
     body = await request.json()
     run_dir_str = body.get("run_dir", "").strip()
     instruction = body.get("instruction", "").strip()
@@ -97,7 +247,7 @@ async def api_improve(request: Request):
         return JSONResponse({"error": "Invalid run directory."}, status_code=400)
 
     try:
-        result = await asyncio.to_thread(
+        result = await run_in_threadpool(
             improve_diagram, run_dir, instruction, image_model=image_model, branch_from_round=branch_from_round,
         )
     except FileNotFoundError as e:
@@ -108,24 +258,8 @@ async def api_improve(request: Request):
         logger.exception("Improvement failed")
         return JSONResponse({"error": "Improvement failed. Check server logs."}, status_code=500)
 
-    image_rel = result.image_path.relative_to(settings.output_dir)
-    image_url = f"/output/{image_rel}"
-
-    return {
-        "image_url": image_url,
-        "round_number": result.round_number,
-        "summary": result.summary,
-        "approved": result.approved,
-        "history": [
-            {
-                "round_number": r.round_number,
-                "summary": r.summary,
-                "image_filename": r.image_filename,
-                "approved": r.approved,
-            }
-            for r in result.history
-        ],
-    }
+    background_tasks.add_task(optimize_png, result.image_path)
+    return _improve_response(result)
 
 
 @app.post("/api/improve-stream")
@@ -153,75 +287,12 @@ async def api_improve_stream(request: Request):
     except ValueError:
         return JSONResponse({"error": "Invalid run directory."}, status_code=400)
 
-    queue: asyncio.Queue[str | None] = asyncio.Queue()
-    loop = asyncio.get_event_loop()
-
-    def progress_callback(step: str) -> None:
-        loop.call_soon_threadsafe(queue.put_nowait, f"event: step\ndata: {step}\n\n")
-
-    async def event_generator():
-        task = asyncio.create_task(asyncio.to_thread(
-            improve_diagram,
-            run_dir,
-            instruction,
-            image_model=image_model,
-            branch_from_round=branch_from_round,
-            progress_callback=progress_callback,
-        ))
-
-        while True:
-            # Wait for either a queue item or the task to finish
-            get_task = asyncio.create_task(queue.get())
-            done, _ = await asyncio.wait(
-                [get_task, task], return_when=asyncio.FIRST_COMPLETED,
-            )
-
-            if get_task in done:
-                msg = get_task.result()
-                if msg is not None:
-                    yield msg
-            else:
-                get_task.cancel()
-
-            if task in done:
-                # Drain remaining queue items
-                while not queue.empty():
-                    msg = queue.get_nowait()
-                    if msg is not None:
-                        yield msg
-                break
-
-        # Send final result or error
-        try:
-            result = task.result()
-            image_rel = result.image_path.relative_to(settings.output_dir)
-            image_url = f"/output/{image_rel}"
-            data = json.dumps({
-                "image_url": image_url,
-                "round_number": result.round_number,
-                "summary": result.summary,
-                "approved": result.approved,
-                "history": [
-                    {
-                        "round_number": r.round_number,
-                        "summary": r.summary,
-                        "image_filename": r.image_filename,
-                        "approved": r.approved,
-                    }
-                    for r in result.history
-                ],
-            })
-            yield f"event: done\ndata: {data}\n\n"
-        except FileNotFoundError as e:
-            yield f"event: error\ndata: {e}\n\n"
-        except ValueError as e:
-            yield f"event: error\ndata: {e}\n\n"
-        except Exception:
-            logger.exception("Improvement failed")
-            yield "event: error\ndata: Improvement failed. Check server logs.\n\n"
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    return _stream_with_progress(
+        improve_diagram,
+        run_dir,
+        instruction,
+        image_model=image_model,
+        branch_from_round=branch_from_round,
+        result_to_dict=_improve_response,
+        failure_message="Improvement failed.",
     )
@@ -6,11 +6,16 @@ import re
 
 from src.config import client, settings
 from src.models import CriticOutput
-from src.utils.image_utils import bytes_to_base64
+from src.utils.image_utils import downscale_to_jpeg_base64
+from src.utils.llm_cache import cache_get, cache_key, cache_set
 from src.utils.prompt_loader import get_prompt
 
 logger = logging.getLogger(__name__)
 
+# Markdown code fences the model sometimes wraps its JSON in
+_FENCE_OPEN = re.compile(r"^```(?:json)?\s*")
+_FENCE_CLOSE = re.compile(r"\s*```$")
+
 
 def _parse_critic_response(text: str) -> tuple[bool, str | None, str]:
     """Parse structured JSON from critic response, with fallback for plain text.
@@ -18,8 +23,7 @@ def _parse_critic_response(text: str) -> tuple[bool, str | None, str]:
     Returns (approved, revised_description, feedback_summary).
     """
     # Strip markdown code fences if present
-    cleaned = re.sub(r"^```(?:json)?\s*", "", text.strip())
-    cleaned = re.sub(r"\s*```$", "", cleaned)
+    cleaned = _FENCE_CLOSE.sub("", _FENCE_OPEN.sub("", text.strip()))
 
     try:
         data = json.loads(cleaned)
@@ -55,9 +59,8 @@ def evaluate(
 
     Returns CriticOutput with approved=True, or approved=False with a
     complete refined description that fixes identified issues.
+    Responses are cached on (model, rendered prompt, image bytes).
     """
-    image_b64 = bytes_to_base64(image_bytes)
-
     prompt_text = get_prompt(
         "critic",
         brief=brief,
@@ -66,25 +69,34 @@ def evaluate(
         T=str(max_rounds),
     )
 
-    content: list[dict] = [
-        {"type": "text", "text": prompt_text},
-        {
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:image/png;base64,{image_b64}",
-                "detail": "high",  # High detail for quality evaluation
+    key = cache_key("critic", settings.llm_model, prompt_text, image_bytes)
+    result_text = cache_get(key)
+
+    if result_text is None:
+        image_b64 = downscale_to_jpeg_base64(image_bytes)
+        content: list[dict] = [
+            {"type": "text", "text": prompt_text},
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{image_b64}",
+                    "detail": "high",  # Keep text legible for the text quality check
+                },
             },
-        },
-    ]
+        ]
 
-    response = client.chat.completions.create(
-        model=settings.llm_model,
-        messages=[{"role": "user", "content": content}],
-        temperature=0.2,  # Low temp for consistent evaluation
-        max_tokens=3000,
-    )
+        response = client.chat.completions.create(
+            model=settings.llm_model,
+            messages=[{"role": "user", "content": content}],
+            temperature=0.2,  # Low temp for consistent evaluation
+            max_tokens=3000,
+        )
+
+        result_text = response.choices[0].message.content.strip()
+        cache_set(key, result_text)
+    else:
+        logger.info("Critic: cache hit (round %d/%d)", current_round, max_rounds)
 
-    result_text = response.choices[0].message.content.strip()
     approved, revised_desc, summary = _parse_critic_response(result_text)
 
     if approved:
@@ -110,15 +122,18 @@ def evaluate_improvement(
     brief: str,
     description: str,
     instruction: str,
+    previous_image_b64: str | None = None,
 ) -> CriticOutput:
     """
     Evaluate a user-requested improvement by comparing new vs previous image.
 
     Sends both images for regression comparison. Uses the critic_improvement
     prompt which prioritises instruction compliance and regression checks.
+    Pass `previous_image_b64` (from downscale_to_jpeg_base64) to reuse an
+    already-encoded previous image across evaluations (e.g. the auto-retry).
     """
-    new_b64 = bytes_to_base64(image_bytes)
-    prev_b64 = bytes_to_base64(previous_image_bytes)
+    new_b64 = downscale_to_jpeg_base64(image_bytes)
+    prev_b64 = previous_image_b64 or downscale_to_jpeg_base64(previous_image_bytes)
 
     prompt_text = get_prompt(
         "critic_improvement",
@@ -136,7 +151,7 @@ def evaluate_improvement(
         {
             "type": "image_url",
             "image_url": {
-                "url": f"data:image/png;base64,{new_b64}",
+                "url": f"data:image/jpeg;base64,{new_b64}",
                 "detail": "high",
             },
         },
@@ -147,7 +162,7 @@ def evaluate_improvement(
         {
             "type": "image_url",
             "image_url": {
-                "url": f"data:image/png;base64,{prev_b64}",
+                "url": f"data:image/jpeg;base64,{prev_b64}",
                 "detail": "high",
             },
         },
@@ -1,12 +1,15 @@
 """Retriever agent: classify brief into diagram category, select matching references."""
 
+import functools
 import json
 import logging
 import random
+from concurrent.futures import ThreadPoolExecutor
 
 from src.config import client, settings
 from src.models import Reference
 from src.utils.image_utils import image_to_base64
+from src.utils.llm_cache import cache_get, cache_key, cache_set
 from src.utils.prompt_loader import get_prompt
 
 logger = logging.getLogger(__name__)
@@ -25,19 +28,42 @@ VALID_CATEGORIES = {
     "pyramid",
 }
 
+_MAX_IMAGE_WORKERS = 8
 
-def _load_refs() -> list[Reference]:
-    """Load refs.json from the references directory."""
+
+def _load_refs_indexed() -> tuple[tuple[Reference, ...], dict[str, tuple[Reference, ...]]]:
+    """Load refs.json as (all refs, refs by category), cached until the file changes."""
+    refs_path = settings.references_dir / "refs.json"
+    return _load_refs_cached(refs_path.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_refs_cached(
+    mtime_ns: int,
+) -> tuple[tuple[Reference, ...], dict[str, tuple[Reference, ...]]]:
+    """Parse refs.json and index it by category. `mtime_ns` is only part of the cache key."""
     refs_path = settings.references_dir / "refs.json"
     with open(refs_path, "r") as f:
         data = json.load(f)
-    return [Reference(**item) for item in data]
+    refs = tuple(Reference(**item) for item in data)
+
+    by_category: dict[str, list[Reference]] = {}
+    for ref in refs:
+        by_category.setdefault(ref.category, []).append(ref)
+    return refs, {category: tuple(items) for category, items in by_category.items()}
 
 
 def _classify_brief(brief: str) -> str:
     """Use LLM to classify the brief into a diagram category."""
     prompt = get_prompt("retriever_classify", brief=brief)
 
+    key = cache_key("retriever_classify", settings.llm_model, prompt)
+    cached = cache_get(key)
+    # Re-validate: VALID_CATEGORIES may have changed since the entry was written
+    if cached in VALID_CATEGORIES:
+        logger.info("Brief classified as category: %s (cached)", cached)
+        return cached
+
     response = client.chat.completions.create(
         model=settings.llm_model,
         messages=[{"role": "user", "content": prompt}],
@@ -53,22 +79,36 @@ def _classify_brief(brief: str) -> str:
             category,
         )
         category = "pipeline"
+    else:
+        # Only cache real classifications, never the fallback
+        cache_set(key, category)
 
     logger.info("Brief classified as category: %s", category)
     return category
 
 
+def _load_ref_image(ref: Reference) -> str | None:
+    """Load and base64-encode a reference image, or None if the file is missing."""
+    image_path = settings.references_dir / ref.file
+    if not image_path.exists():
+        logger.warning("Reference image not found: %s", image_path)
+        return None
+    return image_to_base64(image_path)
+
+
 def select_references(brief: str) -> tuple[list[Reference], str]:
     """
     Classify brief and return matching reference diagrams with base64 images.
 
+    Only the selected references' images are encoded (in parallel).
+
     Returns:
         Tuple of (selected references with images loaded, classified category).
     """
     category = _classify_brief(brief)
-    all_refs = _load_refs()
+    all_refs, refs_by_category = _load_refs_indexed()
 
-    matching = [r for r in all_refs if r.category == category]
+    matching = refs_by_category.get(category, ())
 
     if not matching:
         logger.warning(
@@ -77,15 +117,14 @@ def select_references(brief: str) -> tuple[list[Reference], str]:
         matching = all_refs
 
     n = min(settings.num_references, len(matching))
-    selected = random.sample(matching, n)
-
-    # Load base64 images for each selected reference
-    for ref in selected:
-        image_path = settings.references_dir / ref.file
-        if image_path.exists():
-            ref.image_base64 = image_to_base64(image_path)
-        else:
-            logger.warning("Reference image not found: %s", image_path)
+    # Copy so runtime fields (image_base64) never leak into the cached refs
+    selected = [r.model_copy() for r in random.sample(matching, n)]
+
+    # Load base64 images in parallel (Pillow releases the GIL during decode/encode)
+    if selected:
+        with ThreadPoolExecutor(max_workers=min(_MAX_IMAGE_WORKERS, len(selected))) as ex:
+            for ref, image_b64 in zip(selected, ex.map(_load_ref_image, selected)):
+                ref.image_base64 = image_b64
 
     logger.info("Selected %d references for category '%s'", len(selected), category)
     return selected, category
@@ -1,5 +1,6 @@
 """Stylist agent: enrich visual description with style guide directives."""
 
+import functools
 import logging
 
 from src.config import client, settings
@@ -9,7 +10,13 @@ logger = logging.getLogger(__name__)
 
 
 def _load_style_guide() -> str:
-    """Load the style guide markdown file."""
+    """Load the style guide markdown file (cached until the file changes)."""
+    return _load_style_guide_cached(settings.style_guide_path.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_style_guide_cached(mtime_ns: int) -> str:
+    """Read the style guide. `mtime_ns` is only part of the cache key."""
     with open(settings.style_guide_path, "r") as f:
         return f.read()
 
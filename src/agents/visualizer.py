@@ -10,14 +10,12 @@ from src.utils.prompt_loader import get_prompt
 
 logger = logging.getLogger(__name__)
 
-_system_prompt: str | None = None
+# Static prompt (no placeholders): render once at import
+_system_prompt: str = get_prompt("visualizer_system")
 
 
 def _get_system_prompt() -> str:
-    """Load and cache the visualizer system prompt."""
-    global _system_prompt
-    if _system_prompt is None:
-        _system_prompt = get_prompt("visualizer_system")
+    """Return the cached visualizer system prompt."""
     return _system_prompt
 
 
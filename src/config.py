@@ -3,7 +3,7 @@
 from pathlib import Path
 import logging
 
-from openai import OpenAI
+from openai import DefaultHttpxClient, OpenAI
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -31,18 +31,21 @@ class Settings(BaseSettings):
     # Pipeline Config
     max_refinement_rounds: int = Field(default=3, ge=1, le=10)
     num_references: int = Field(default=5, ge=1, le=20)
+    llm_cache_enabled: bool = True
 
     # Paths (resolved to absolute via validator)
     output_dir: Path = Path("output")
     references_dir: Path = Path("references")
     style_guide_path: Path = Path("config/style_guide.md")
     prompts_path: Path = Path("config/prompts.yaml")
+    llm_cache_dir: Path = Path(".cache/llm")  # Outside output_dir, which is served publicly
 
     # Logging
     log_level: str = "INFO"
 
     @field_validator(
         "output_dir", "references_dir", "style_guide_path", "prompts_path",
+        "llm_cache_dir",
         mode="before",
     )
     @classmethod
@@ -68,8 +71,12 @@ logging.basicConfig(
     format="%(asctime)s [%(name)s] %(levelname)s: %(message)s",
 )
 
+# Keep the SDK's own pooling, limits and timeouts; only enable HTTP/2 so
+# concurrent agent calls can multiplex over one connection
+_http_client = DefaultHttpxClient(http2=True)
+
 # OpenAI client singleton
-client = OpenAI(api_key=settings.openai_api_key)
+client = OpenAI(api_key=settings.openai_api_key, http_client=_http_client)
 
 # Google GenAI client singleton (lazy-initialised)
 _google_client = None
@@ -3,15 +3,18 @@
 import json
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 from collections.abc import Callable
 
+import orjson
+
 from src.agents import critic, planner, retriever, stylist, visualizer
 from src.config import client, settings
 from src.models import ImprovementResult, ImprovementRound, PipelineResult, RunMetadata
-from src.utils.image_utils import save_image
+from src.utils.image_utils import downscale_to_jpeg_base64, link_image, save_image
 from src.utils.prompt_loader import get_prompt
 
 logger = logging.getLogger(__name__)
@@ -19,23 +22,38 @@ logger = logging.getLogger(__name__)
 
 def _create_run_dir() -> Path:
     """Create a timestamped directory for this run's outputs."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Microseconds keep concurrent runs started in the same second apart
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     run_dir = settings.output_dir / timestamp
-    run_dir.mkdir(parents=True, exist_ok=True)
+    run_dir.mkdir(parents=True, exist_ok=False)
     return run_dir
 
 
 def _save_text(run_dir: Path, filename: str, content: str) -> None:
-    """Save a text artifact to the run directory."""
+    """Save a text artifact to the run directory (UTF-8, as orjson emits raw non-ASCII)."""
     path = run_dir / filename
-    with open(path, "w") as f:
+    with open(path, "w", encoding="utf-8") as f:
         f.write(content)
 
 
+def _flush_artifacts(run_dir: Path, artifacts: list[tuple[str, str]]) -> None:
+    """
+    Write buffered (filename, content) text artifacts to the run directory.
+
+    Runs at the end of generate_diagram, including on exceptions. A process that
+    is killed mid-run (e.g. a `uvicorn --reload` restart) loses all buffered
+    text artifacts; only the round images, saved inline, survive.
+    """
+    for filename, content in artifacts:
+        _save_text(run_dir, filename, content)
+
+
 def generate_diagram(
     brief: str,
     max_rounds: int | None = None,
     image_model: str | None = None,
+    progress_callback: Callable[[str], None] | None = None,
+    image_callback: Callable[[int, Path], None] | None = None,
 ) -> PipelineResult:
     """
     Execute the full pipeline:
@@ -44,10 +62,20 @@ def generate_diagram(
     Args:
         brief: Natural-language description of the desired diagram.
         max_rounds: Override max refinement rounds (default: from .env).
+        progress_callback: Called with a step key ("retriever", "planner",
+            "stylist", "visualizer", "critic", "refining", "finalising")
+            as each step starts. Keys never go backwards: rounds after the
+            first report only "refining".
+        image_callback: Called with (round number, image path) as soon as
+            each round's image is saved.
 
     Returns:
         PipelineResult with final image, path, and metadata.
     """
+    def _step(key: str) -> None:
+        if progress_callback is not None:
+            progress_callback(key)
+
     rounds = max_rounds or settings.max_refinement_rounds
     start_time = time.time()
     run_dir = _create_run_dir()
@@ -55,108 +83,129 @@ def generate_diagram(
     logger.info("=== Pipeline started === Run dir: %s", run_dir)
     logger.info("Brief: %s", brief[:100] + "..." if len(brief) > 100 else brief)
 
-    # ── Phase 1: Linear Planning ──────────────────────────────────────
-
-    # Step 1: Retrieve references
-    logger.info("--- Step 1: Retriever ---")
-    refs, category = retriever.select_references(brief)
-    refs_metadata = [r.model_dump(exclude={"image_base64"}) for r in refs]
-    _save_text(run_dir, "01_retriever_refs.json", json.dumps(refs_metadata, indent=2))
-
-    # Step 2: Plan visual description
-    logger.info("--- Step 2: Planner ---")
-    planner_output = planner.create_description(brief, refs)
-    _save_text(run_dir, "02_planner_description.md", planner_output.description)
+    # Text artifacts are buffered and written together at the end (or on failure);
+    # images are saved inline.
+    artifacts: list[tuple[str, str]] = []
 
-    # Step 3: Apply style
-    logger.info("--- Step 3: Stylist ---")
-    styled_description = stylist.apply_style(planner_output.description, category)
-    _save_text(run_dir, "03_stylist_description.md", styled_description)
-
-    # ── Phase 2: Iterative Refinement ─────────────────────────────────
-
-    current_description = styled_description
-    final_image_bytes = None
-    approved = False
-    rounds_taken = 0
-
-    for round_num in range(1, rounds + 1):
-        logger.info(
-            "--- Round %d/%d: Visualizer ---", round_num, rounds
-        )
-
-        # Generate image
-        image_bytes = visualizer.generate_image(current_description, image_model=image_model)
-        save_image(image_bytes, run_dir / f"04_round_{round_num}_image.png")
-        final_image_bytes = image_bytes
-        rounds_taken = round_num
-
-        # Critique
-        logger.info("--- Round %d/%d: Critic ---", round_num, rounds)
-        critique = critic.evaluate(
-            image_bytes=image_bytes,
+    try:
+        # ── Phase 1: Linear Planning ──────────────────────────────────────
+
+        # Step 1: Retrieve references
+        _step("retriever")
+        logger.info("--- Step 1: Retriever ---")
+        refs, category = retriever.select_references(brief)
+        refs_metadata = [r.model_dump(exclude={"image_base64"}) for r in refs]
+        artifacts.append(("01_retriever_refs.json", orjson.dumps(refs_metadata, option=orjson.OPT_INDENT_2).decode()))
+
+        # Step 2: Plan visual description
+        _step("planner")
+        logger.info("--- Step 2: Planner ---")
+        planner_output = planner.create_description(brief, refs)
+        artifacts.append(("02_planner_description.md", planner_output.description))
+
+        # Step 3: Apply style
+        _step("stylist")
+        logger.info("--- Step 3: Stylist ---")
+        styled_description = stylist.apply_style(planner_output.description, category)
+        artifacts.append(("03_stylist_description.md", styled_description))
+
+        # ── Phase 2: Iterative Refinement ─────────────────────────────────
+
+        current_description = styled_description
+        final_image_bytes = None
+        approved = False
+        rounds_taken = 0
+
+        for round_num in range(1, rounds + 1):
+            _step("visualizer" if round_num == 1 else "refining")
+            logger.info(
+                "--- Round %d/%d: Visualizer ---", round_num, rounds
+            )
+
+            # Generate image
+            image_bytes = visualizer.generate_image(current_description, image_model=image_model)
+            round_image_path = save_image(image_bytes, run_dir / f"04_round_{round_num}_image.png")
+            final_image_bytes = image_bytes
+            rounds_taken = round_num
+            if image_callback is not None:
+                image_callback(round_num, round_image_path)
+
+            # Critique
+            if round_num == 1:
+                _step("critic")
+            logger.info("--- Round %d/%d: Critic ---", round_num, rounds)
+            critique = critic.evaluate(
+                image_bytes=image_bytes,
+                brief=brief,
+                description=current_description,
+                current_round=round_num,
+                max_rounds=rounds,
+            )
+
+            if critique.approved:
+                approved = True
+                artifacts.append((f"04_round_{round_num}_critique.md", "APPROVED"))
+                logger.info("Image approved on round %d", round_num)
+                break
+
+            artifacts.append((
+                f"04_round_{round_num}_critique.md",
+                critique.refined_description or "",
+            ))
+            # Keep the current description if the critic rejected without a revision
+            if critique.refined_description:
+                current_description = critique.refined_description
+            logger.info("Round %d: refinement needed, continuing...", round_num)
+
+        if not approved:
+            logger.warning(
+                "Max rounds (%d) exhausted without approval. Using last generated image.",
+                rounds,
+            )
+
+        # Save the description that produced the final image
+        artifacts.append(("04_final_description.md", current_description))
+
+        # ── Save final outputs ────────────────────────────────────────────
+
+        _step("finalising")
+        # Same bytes as the last round image: link rather than rewrite
+        link_image(final_image_bytes, round_image_path, run_dir / "00_original_image.png")
+        final_path = link_image(final_image_bytes, round_image_path, run_dir / "final.png")
+
+        elapsed = time.time() - start_time
+        metadata = RunMetadata(
             brief=brief,
-            description=current_description,
-            current_round=round_num,
-            max_rounds=rounds,
+            category=category,
+            num_references=len(refs),
+            llm_model=settings.llm_model,
+            image_model=image_model or settings.image_model,
+            rounds_taken=rounds_taken,
+            approved=approved,
+            timestamp=datetime.now().isoformat(),
+            elapsed_seconds=round(elapsed, 2),
         )
+        artifacts.append((
+            "run_metadata.json",
+            orjson.dumps(metadata.model_dump(), option=orjson.OPT_INDENT_2).decode(),
+        ))
 
-        if critique.approved:
-            approved = True
-            _save_text(run_dir, f"04_round_{round_num}_critique.md", "APPROVED")
-            logger.info("Image approved on round %d", round_num)
-            break
-
-        _save_text(
-            run_dir,
-            f"04_round_{round_num}_critique.md",
-            critique.refined_description or "",
+        logger.info(
+            "=== Pipeline completed === Rounds: %d, Approved: %s, Time: %.1fs",
+            rounds_taken,
+            approved,
+            elapsed,
         )
-        current_description = critique.refined_description
-        logger.info("Round %d: refinement needed, continuing...", round_num)
 
-    if not approved:
-        logger.warning(
-            "Max rounds (%d) exhausted without approval. Using last generated image.",
-            rounds,
+        return PipelineResult(
+            image_bytes=final_image_bytes,
+            image_path=final_path,
+            rounds_taken=rounds_taken,
+            approved=approved,
+            run_dir=run_dir,
         )
-
-    # Save the description that produced the final image
-    _save_text(run_dir, "04_final_description.md", current_description)
-
-    # ── Save final outputs ────────────────────────────────────────────
-
-    save_image(final_image_bytes, run_dir / "00_original_image.png")
-    final_path = save_image(final_image_bytes, run_dir / "final.png")
-
-    elapsed = time.time() - start_time
-    metadata = RunMetadata(
-        brief=brief,
-        category=category,
-        num_references=len(refs),
-        llm_model=settings.llm_model,
-        image_model=image_model or settings.image_model,
-        rounds_taken=rounds_taken,
-        approved=approved,
-        timestamp=datetime.now().isoformat(),
-        elapsed_seconds=round(elapsed, 2),
-    )
-    _save_text(run_dir, "run_metadata.json", metadata.model_dump_json(indent=2))
-
-    logger.info(
-        "=== Pipeline completed === Rounds: %d, Approved: %s, Time: %.1fs",
-        rounds_taken,
-        approved,
-        elapsed,
-    )
-
-    return PipelineResult(
-        image_bytes=final_image_bytes,
-        image_path=final_path,
-        rounds_taken=rounds_taken,
-        approved=approved,
-        run_dir=run_dir,
-    )
+    finally:
+        _flush_artifacts(run_dir, artifacts)
 
 
 # ── Improvement Loop ──────────────────────────────────────────────────
@@ -170,14 +219,14 @@ def _load_improvements(run_dir: Path) -> list[ImprovementRound]:
     path = run_dir / "improvements.json"
     if not path.exists():
         return []
-    with open(path) as f:
+    with open(path, encoding="utf-8") as f:
         return [ImprovementRound(**r) for r in json.loads(f.read())]
 
 
 def _save_improvements(run_dir: Path, history: list[ImprovementRound]) -> None:
     """Persist the full improvement history to improvements.json."""
     data = [r.model_dump() for r in history]
-    _save_text(run_dir, "improvements.json", json.dumps(data, indent=2))
+    _save_text(run_dir, "improvements.json", orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
 
 
 def _get_last_description(run_dir: Path, history: list[ImprovementRound]) -> str:
@@ -185,8 +234,8 @@ def _get_last_description(run_dir: Path, history: list[ImprovementRound]) -> str
     if history:
         last = history[-1]
         path = run_dir / f"05_improvement_{last.round_number}_description.md"
-        return path.read_text()
-    return (run_dir / "04_final_description.md").read_text()
+        return path.read_text(encoding="utf-8")
+    return (run_dir / "04_final_description.md").read_text(encoding="utf-8")
 
 
 def _get_last_image_bytes(run_dir: Path, history: list[ImprovementRound]) -> bytes:
@@ -279,7 +328,7 @@ def improve_diagram(
 
     # Load context
     metadata_path = run_dir / "run_metadata.json"
-    with open(metadata_path) as f:
+    with open(metadata_path, encoding="utf-8") as f:
         run_meta = json.loads(f.read())
     brief = run_meta["brief"]
 
@@ -302,19 +351,20 @@ def improve_diagram(
 
     last_description = _get_last_description(run_dir, history)
     last_image_bytes = _get_last_image_bytes(run_dir, history)
+    last_image_b64 = downscale_to_jpeg_base64(last_image_bytes)  # Shared by both critic passes
     round_number = (max(r.round_number for r in history) + 1) if history else 1
 
     logger.info("Improvement round %d, instruction: %s", round_number, instruction[:80])
 
-    # Generate summary
-    _step("Summarising instruction")
-    summary = _generate_summary(instruction)
-    logger.info("Summary: %s", summary)
-
-    # Merge instruction into description
-    _step("Merging description")
+    # Summary and merge are independent LLM calls — run them concurrently
+    _step("Summarising and merging instruction")
     history_text = _format_history_for_prompt(history)
-    merged_description = _merge_description(last_description, instruction, history_text)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        summary_future = ex.submit(_generate_summary, instruction)
+        merge_future = ex.submit(_merge_description, last_description, instruction, history_text)
+        summary = summary_future.result()
+        merged_description = merge_future.result()
+    logger.info("Summary: %s", summary)
     logger.info("Description merged (%d words)", len(merged_description.split()))
 
     # Save pre-restyle artifact for debuggability
@@ -343,6 +393,7 @@ def improve_diagram(
         brief=brief,
         description=merged_description,
         instruction=instruction,
+        previous_image_b64=last_image_b64,
     )
 
     current_description = merged_description
@@ -362,6 +413,7 @@ def improve_diagram(
             brief=brief,
             description=current_description,
             instruction=instruction,
+            previous_image_b64=last_image_b64,
         )
         approved = retry_critique.approved
         critique = retry_critique
@@ -1,7 +1,11 @@
 """Image encoding, resizing, and file I/O utilities."""
 
 import base64
+import functools
 import logging
+import os
+import shutil
+import subprocess
 from io import BytesIO
 from pathlib import Path
 
@@ -9,6 +13,12 @@ from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+# Fast zlib level for the request path; final.png is recompressed afterwards
+# by optimize_png when oxipng is installed
+_PNG_COMPRESS_LEVEL = 1
+
 
 def image_to_base64(image_path: Path, max_dimension: int = 1024) -> str:
     """
@@ -16,7 +26,17 @@ def image_to_base64(image_path: Path, max_dimension: int = 1024) -> str:
 
     Used for injecting reference images into multimodal prompts.
     Resizes so the largest dimension is at most `max_dimension` pixels.
+    Results are cached per (path, mtime, max_dimension), so an edited file
+    is re-encoded on the next call.
     """
+    mtime_ns = image_path.stat().st_mtime_ns
+    return _image_to_base64_cached(str(image_path), mtime_ns, max_dimension)
+
+
+@functools.lru_cache(maxsize=128)
+def _image_to_base64_cached(path_str: str, mtime_ns: int, max_dimension: int) -> str:
+    """Encode an image file to base64 PNG. `mtime_ns` is only part of the cache key."""
+    image_path = Path(path_str)
     img = Image.open(image_path)
     original_size = img.size
 
@@ -34,22 +54,98 @@ def image_to_base64(image_path: Path, max_dimension: int = 1024) -> str:
 
 
 def normalize_to_png(image_bytes: bytes) -> bytes:
-    """Convert any supported image format (WEBP, JPEG, etc.) to PNG bytes."""
-    img = Image.open(BytesIO(image_bytes)).convert("RGB")
+    """Convert any supported image format (WEBP, JPEG, etc.) to PNG bytes.
+
+    Input that is already PNG is returned unchanged.
+    """
+    if image_bytes[:8] == _PNG_MAGIC:
+        return image_bytes
+
+    img = Image.open(BytesIO(image_bytes))
+    # PNG stores these modes natively; only convert the rest (CMYK, YCbCr, I;16...)
+    if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+        img = img.convert("RGB")
     buf = BytesIO()
-    img.save(buf, format="PNG")
+    img.save(buf, format="PNG", compress_level=_PNG_COMPRESS_LEVEL)
     return buf.getvalue()
 
 
-def bytes_to_base64(image_bytes: bytes) -> str:
-    """Convert raw image bytes to base64 string."""
-    return base64.b64encode(image_bytes).decode("utf-8")
+def downscale_to_jpeg_base64(
+    image_bytes: bytes, max_dimension: int = 1024, quality: int = 85
+) -> str:
+    """
+    Shrink image bytes to at most `max_dimension` px and return base64 JPEG.
+
+    Used for images sent to the vision model for evaluation, where full
+    resolution only adds tiles (tokens and latency) without helping judgement.
+    """
+    img = Image.open(BytesIO(image_bytes))
+    # Convert first: Pillow falls back to NEAREST when resizing P/1-mode images,
+    # which aliases small text. JPEG also has no alpha channel.
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
 
 
 def save_image(image_bytes: bytes, output_path: Path) -> Path:
-    """Save image bytes to disk. Returns the path."""
+    """Save image bytes to disk. Returns the path.
+
+    Writes to a temp file and swaps it in, so the target is never truncated in
+    place (which would also rewrite any hardlinks made by link_image).
+    """
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "wb") as f:
+    tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
         f.write(image_bytes)
+    os.replace(tmp_path, output_path)
     logger.info("Saved image to %s (%d bytes)", output_path, len(image_bytes))
     return output_path
+
+
+def link_image(image_bytes: bytes, source_path: Path, output_path: Path) -> Path:
+    """
+    Hardlink an already-saved image to `output_path` instead of writing it again.
+
+    Falls back to save_image when linking isn't possible (e.g. unsupported
+    filesystem). Returns the path.
+    """
+    output_path.unlink(missing_ok=True)
+    try:
+        os.link(source_path, output_path)
+    except OSError:
+        logger.debug("Hardlink %s -> %s failed, writing copy", output_path, source_path)
+        return save_image(image_bytes, output_path)
+    logger.info("Linked %s to %s", output_path, source_path.name)
+    return output_path
+
+
+def optimize_png(path: Path) -> None:
+    """
+    Losslessly recompress a PNG in place with oxipng, if it is installed.
+
+    Meant to run after the response has been sent (e.g. as a FastAPI
+    background task). The file is swapped atomically so concurrent readers
+    never see a partial write.
+    """
+    oxipng = shutil.which("oxipng")
+    if oxipng is None:
+        logger.debug("oxipng not installed, skipping optimisation of %s", path)
+        return
+
+    tmp_path = path.with_suffix(".opt.png")
+    try:
+        subprocess.run(
+            [oxipng, "-o", "2", "--strip", "safe", "--out", str(tmp_path), str(path)],
+            check=True,
+            capture_output=True,
+        )
+        os.replace(tmp_path, path)
+    except (OSError, subprocess.CalledProcessError):
+        logger.warning("oxipng failed on %s, keeping original", path, exc_info=True)
+        tmp_path.unlink(missing_ok=True)
+        return
+    logger.info("Optimised %s (%d bytes)", path, path.stat().st_size)
@@ -0,0 +1,49 @@
+"""Exact-match disk cache for LLM responses, keyed on model + prompt inputs."""
+
+import hashlib
+import logging
+
+import diskcache
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+_cache: diskcache.Cache | None = None
+
+
+def _get_cache() -> diskcache.Cache:
+    """Open the on-disk cache (lazily, on first use)."""
+    global _cache
+    if _cache is None:
+        _cache = diskcache.Cache(str(settings.llm_cache_dir))
+        logger.debug("Opened LLM cache at %s", settings.llm_cache_dir)
+    return _cache
+
+
+def cache_key(namespace: str, *parts: str | bytes) -> str:
+    """
+    Build a cache key from a namespace and the inputs that determine the response.
+
+    Example:
+        cache_key("critic", settings.llm_model, prompt_text, image_bytes)
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        # Hash each part separately so ("ab", "c") and ("a", "bc") differ
+        digest.update(hashlib.sha256(data).digest())
+    return f"{namespace}:{digest.hexdigest()}"
+
+
+def cache_get(key: str) -> str | None:
+    """Return the cached response for `key`, or None on a miss / when disabled."""
+    if not settings.llm_cache_enabled:
+        return None
+    return _get_cache().get(key)
+
+
+def cache_set(key: str, value: str) -> None:
+    """Store a response under `key` (no-op when caching is disabled)."""
+    if settings.llm_cache_enabled:
+        _get_cache().set(key, value)
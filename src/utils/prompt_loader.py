@@ -43,3 +43,7 @@ def get_prompt(agent_name: str, **kwargs: str) -> str:
 
     logger.debug("Rendered prompt '%s' (%d chars)", agent_name, len(rendered))
     return rendered
+
+
+# Parse the YAML at import so the first request doesn't pay for it
+_load_prompts()